@@ -1,18 +1,27 @@
 from __future__ import annotations
 
 import os
+import pickle
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Any
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import pandas as pd
+import orjson
 from flask import Flask, jsonify, render_template, request, abort
+from flask.json.provider import DefaultJSONProvider
+from openpyxl import load_workbook
 
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(APP_DIR, "data")
 SHEET_NAME = "data"
 
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+CACHE_VERSION = 4  # bump when Survey/Question/Option fields change
+
 
 # ====== Excel columns (must match your template) ======
 COL_ROWTYPE = "RowType"
@@ -33,18 +42,25 @@ COL_NEXTID = "NextId"
 
 # Answer1..Answer10
 # NextIfAnswer1..NextIfAnswer10
+ANSWER_COLS = [f"Answer{i}" for i in range(1, 11)]
+NEXT_COLS = [f"NextIfAnswer{i}" for i in range(1, 11)]
+ANS_PAIRS = list(zip(range(1, 11), ANSWER_COLS, NEXT_COLS))
+
+CORE_COLS = frozenset({
+    COL_ROWTYPE,
+    COL_SURVEY_TITLE, COL_SURVEY_DESC, COL_START_QID, COL_FINAL_TITLE, COL_FINAL_TEXT,
+    COL_QID, COL_Q_TITLE, COL_Q_TEXT, COL_Q_LONG, COL_HINTS, COL_TYPE,
+    COL_NEXTID,
+})
+# answers + nextif columns are optional but expected; we won't hard-fail if missing, but prefer to have them
+USECOLS = CORE_COLS | frozenset(ANSWER_COLS) | frozenset(NEXT_COLS)
 
 
 def _safe_str(v: Any) -> str:
     if v is None:
         return ""
-    if isinstance(v, float) and pd.isna(v):
+    if isinstance(v, float) and v != v:  # NaN check without pd.isna
         return ""
-    try:
-        if pd.isna(v):
-            return ""
-    except Exception:
-        pass
     return str(v).strip()
 
 
@@ -52,34 +68,51 @@ def _norm(s: str) -> str:
     return (s or "").strip().lower()
 
 
+_SLUG_WS = re.compile(r"\s+")
+_SLUG_BAD = re.compile(r"[^A-Za-z0-9_-]+")
+
+
 def _slugify(name: str) -> str:
     # stable id from filename: letters/numbers/_-
     base = os.path.splitext(os.path.basename(name))[0]
-    base = re.sub(r"\s+", "_", base)
-    base = re.sub(r"[^A-Za-z0-9_-]+", "", base)
+    base = _SLUG_WS.sub("_", base)
+    base = _SLUG_BAD.sub("", base)
     return base or "survey"
 
 
-@dataclass(frozen=True)
+class QType(str, Enum):
+    # str mixin keeps JSON payloads and comparisons against plain strings
+    # working while giving one interned member per type
+    SINGLE = "single"
+    MULTI = "multi"
+    TEXT = "text"
+    NUMBER = "number"
+
+
+_VALID_QTYPES = frozenset(t.value for t in QType)
+
+
+@dataclass(frozen=True, slots=True)
 class Option:
     idx: int
     text: str
     next_qid: Optional[str] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Question:
     qid: str
-    qtype: str  # single/multi/text/number
+    qtype: QType
     title: str
     text: str
     long_text: str
     hints: str
     options: List[Option]
+    options_by_idx: Dict[int, Option]  # precomputed for O(1) answer lookups
     next_id: Optional[str]  # for multi/text/number
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Survey:
     key: str              # derived from file name
     file_name: str        # displayed / debug
@@ -89,30 +122,79 @@ class Survey:
     final_title: str
     final_text: str
     questions: Dict[str, Question]
+    question_payloads: Dict[str, bytes]  # pre-serialized api_get_question responses
 
 
-def load_survey_from_excel(filepath: str) -> Survey:
-    df = pd.read_excel(filepath, sheet_name=SHEET_NAME)
-    df.columns = [c.strip() for c in df.columns]
-
-    required = {
-        COL_ROWTYPE,
-        COL_SURVEY_TITLE, COL_SURVEY_DESC, COL_START_QID, COL_FINAL_TITLE, COL_FINAL_TEXT,
-        COL_QID, COL_Q_TITLE, COL_Q_TEXT, COL_Q_LONG, COL_HINTS, COL_TYPE,
-        COL_NEXTID
+def _build_question_payloads(key: str, questions: Dict[str, Question]) -> Dict[str, bytes]:
+    # questions never change at runtime, so serialize each response once at load
+    return {
+        qid: orjson.dumps({
+            "ok": True,
+            "survey_key": key,
+            "qid": q.qid,
+            "type": q.qtype,
+            "title": q.title,
+            "text": q.text,
+            "long_text": q.long_text,
+            "hints": q.hints,
+            "options": [{"idx": opt.idx, "text": opt.text} for opt in q.options],
+        })
+        for qid, q in questions.items()
     }
-    # answers + nextif columns are optional but expected; we won't hard-fail if missing, but prefer to have them
-    missing_core = sorted(required - set(df.columns))
+
+
+def _read_sheet_rows(filepath: str) -> tuple[List[str], List[Dict[str, Any]]]:
+    # read_only streams the sheet XML instead of building the full cell tree,
+    # data_only gives computed values for formula cells
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        if SHEET_NAME not in wb.sheetnames:
+            raise ValueError(f"{os.path.basename(filepath)}: no sheet '{SHEET_NAME}' found")
+        ws = wb[SHEET_NAME]
+        rows_iter = ws.iter_rows(values_only=True)
+        header = next(rows_iter, None)
+        if not header:
+            raise ValueError(f"{os.path.basename(filepath)}: sheet '{SHEET_NAME}' is empty")
+        # keep only template columns; users sometimes add note columns we'd
+        # otherwise carry through every row dict
+        wanted = [
+            (idx, name)
+            for idx, c in enumerate(header)
+            if c is not None and (name := str(c).strip()) in USECOLS
+        ]
+        columns = [name for _, name in wanted]
+        # trailing empty cells may be dropped per row in read-only mode
+        rows = [
+            {name: vals[idx] for idx, name in wanted if idx < len(vals)}
+            for vals in rows_iter
+        ]
+        return columns, rows
+    finally:
+        wb.close()
+
+
+def load_survey_from_excel(filepath: str) -> Survey:
+    columns, rows = _read_sheet_rows(filepath)
+
+    missing_core = sorted(CORE_COLS - set(columns))
     if missing_core:
         raise ValueError(f"{os.path.basename(filepath)}: missing columns in sheet '{SHEET_NAME}': {missing_core}")
 
     key = _slugify(filepath)
 
-    # Meta row
-    meta_rows = df[df[COL_ROWTYPE].astype(str).str.lower().str.strip() == "survey"]
-    if meta_rows.empty:
+    # bucket rows by RowType in a single pass; note/blank rows are dropped
+    # here before any other per-row work
+    m: Optional[Dict[str, Any]] = None
+    qrows: List[Dict[str, Any]] = []
+    for r in rows:
+        rt = _norm(_safe_str(r.get(COL_ROWTYPE)))
+        if rt == "question":
+            qrows.append(r)
+        elif rt == "survey" and m is None:  # first survey row wins
+            m = r
+
+    if m is None:
         raise ValueError(f"{os.path.basename(filepath)}: no RowType=survey row found")
-    m = meta_rows.iloc[0]
 
     title = _safe_str(m.get(COL_SURVEY_TITLE)) or key
     description = _safe_str(m.get(COL_SURVEY_DESC))
@@ -121,29 +203,26 @@ def load_survey_from_excel(filepath: str) -> Survey:
     final_text = _safe_str(m.get(COL_FINAL_TEXT)) or "Спасибо! Ваши ответы:\n{answers}"
 
     # Questions
-    qrows = df[df[COL_ROWTYPE].astype(str).str.lower().str.strip() == "question"].copy()
     questions: Dict[str, Question] = {}
 
-    for _, r in qrows.iterrows():
+    for r in qrows:
         qid = _safe_str(r.get(COL_QID))
         if not qid:
             continue
 
         qtype = _norm(_safe_str(r.get(COL_TYPE)))
-        if qtype not in {"single", "multi", "text", "number"}:
+        if qtype not in _VALID_QTYPES:
             raise ValueError(f"{os.path.basename(filepath)}: question {qid}: invalid Type='{qtype}'")
+        qtype = QType(qtype)
 
-        opts: List[Option] = []
         next_id = _safe_str(r.get(COL_NEXTID)) or None
 
-        # gather options
-        for i in range(1, 11):
-            a_col = f"Answer{i}"
-            n_col = f"NextIfAnswer{i}"
-            a = _safe_str(r.get(a_col))
-            n = _safe_str(r.get(n_col))
-            if a:
-                opts.append(Option(idx=i, text=a, next_qid=n or None))
+        # gather options; NextIfAnswerN is only looked at for filled answers
+        opts: List[Option] = [
+            Option(idx=i, text=a, next_qid=_safe_str(r.get(n_col)) or None)
+            for i, a_col, n_col in ANS_PAIRS
+            if (a := _safe_str(r.get(a_col)))
+        ]
 
         # Validate by type
         if qtype in {"single", "multi"}:
@@ -165,6 +244,7 @@ def load_survey_from_excel(filepath: str) -> Survey:
             long_text=_safe_str(r.get(COL_Q_LONG)),
             hints=_safe_str(r.get(COL_HINTS)),
             options=opts,
+            options_by_idx={o.idx: o for o in opts},
             next_id=next_id,
         )
 
@@ -184,48 +264,145 @@ def load_survey_from_excel(filepath: str) -> Survey:
         final_title=final_title,
         final_text=final_text,
         questions=questions,
+        question_payloads=_build_question_payloads(key, questions),
     )
 
 
+def _load_survey_cached(filepath: str) -> Survey:
+    """Load a survey, going through a pickle cache in data/.cache.
+
+    Parsing xlsx (openpyxl XML) is the slowest part of startup; a cached
+    Survey keyed by file size+mtime loads in milliseconds. Set
+    SURVEYS_NO_CACHE=1 to always re-parse.
+    """
+    if os.environ.get("SURVEYS_NO_CACHE") == "1":
+        return load_survey_from_excel(filepath)
+
+    st = os.stat(filepath)
+    cache_name = f"{_slugify(filepath)}-v{CACHE_VERSION}-{st.st_size}-{st.st_mtime_ns}.pkl"
+    cache_path = os.path.join(CACHE_DIR, cache_name)
+
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                s = pickle.load(f)
+            # distinct files can slugify to the same key; only trust the
+            # entry if it really came from this file
+            if s.file_name == os.path.basename(filepath):
+                return s
+        except Exception:
+            pass  # stale/corrupt cache -> fall through to re-parse
+
+    s = load_survey_from_excel(filepath)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            pickle.dump(s, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # cache is best-effort
+    return s
+
+
 def load_all_surveys(data_dir: str) -> Dict[str, Survey]:
     surveys: Dict[str, Survey] = {}
     if not os.path.isdir(data_dir):
         return surveys
 
-    for name in os.listdir(data_dir):
-        if not name.lower().endswith(".xlsx"):
-            continue
-        if name.startswith("~$"):  # excel temp
-            continue
+    paths = [
+        os.path.join(data_dir, name)
+        for name in sorted(os.listdir(data_dir))  # sorted -> deterministic collision keys
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")  # skip excel temp files
+    ]
+    if not paths:
+        return surveys
 
-        path = os.path.join(data_dir, name)
-        try:
-            s = load_survey_from_excel(path)
-            # ensure unique key
-            key = s.key
-            if key in surveys:
-                key = f"{key}_{len(surveys)+1}"
-                s = Survey(
-                    key=key,
-                    file_name=s.file_name,
-                    title=s.title,
-                    description=s.description,
-                    start_qid=s.start_qid,
-                    final_title=s.final_title,
-                    final_text=s.final_text,
-                    questions=s.questions,
-                )
-            surveys[s.key] = s
-        except Exception as e:
-            # Fail fast is usually better, but to keep UI alive:
-            # you can comment next line if you want strict startup
-            raise
+    # parsing N workbooks is independent; fan out over a small thread pool
+    # (zip inflate releases the GIL, and warm loads are just pickle reads)
+    workers = min(8, len(paths), os.cpu_count() or 1)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            loaded = list(ex.map(_load_survey_cached, paths))
+    else:
+        loaded = [_load_survey_cached(p) for p in paths]
+
+    for s in loaded:
+        # ensure unique key
+        key = s.key
+        if key in surveys:
+            key = f"{key}_{len(surveys)+1}"
+            s = Survey(
+                key=key,
+                file_name=s.file_name,
+                title=s.title,
+                description=s.description,
+                start_qid=s.start_qid,
+                final_title=s.final_title,
+                final_text=s.final_text,
+                questions=s.questions,
+                question_payloads=_build_question_payloads(key, s.questions),
+            )
+        surveys[s.key] = s
 
     return surveys
 
 
+class SurveyRegistry:
+    """Lazy holder for the surveys in data/.
+
+    Loading at import blocked startup by the total parse time of every
+    xlsx; the registry defers load_all_surveys to the first access, so
+    process start is O(1) and only serving traffic pays the (cached,
+    parallel) load once.
+    """
+
+    def __init__(self, data_dir: str) -> None:
+        self._data_dir = data_dir
+        self._lock = threading.Lock()
+        self._surveys: Optional[Dict[str, Survey]] = None
+        self._sorted: Optional[List[Survey]] = None
+
+    def _ensure_loaded(self) -> Dict[str, Survey]:
+        surveys = self._surveys
+        if surveys is None:
+            with self._lock:
+                surveys = self._surveys
+                if surveys is None:
+                    surveys = self._surveys = load_all_surveys(self._data_dir)
+        return surveys
+
+    def get(self, key: str) -> Optional[Survey]:
+        return self._ensure_loaded().get(key)
+
+    def all(self) -> Dict[str, Survey]:
+        return self._ensure_loaded()
+
+    def preload(self) -> None:
+        self._ensure_loaded()
+
+    def sorted_by_title(self) -> List[Survey]:
+        # surveys never change at runtime, so sort the cards once;
+        # casefold() sorts Cyrillic titles correctly where lower() may not
+        items = self._sorted
+        if items is None:
+            items = self._sorted = sorted(
+                self._ensure_loaded().values(), key=lambda s: s.title.casefold()
+            )
+        return items
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (much faster than stdlib json)."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
-SURVEYS = load_all_surveys(DATA_DIR)
+app.json = ORJSONProvider(app)
+SURVEYS = SurveyRegistry(DATA_DIR)
 
 
 def get_survey_or_404(key: str) -> Survey:
@@ -238,8 +415,7 @@ def get_survey_or_404(key: str) -> Survey:
 @app.get("/")
 def index():
     # cards from all files
-    items = sorted(SURVEYS.values(), key=lambda x: x.title.lower())
-    return render_template("index.html", surveys=items)
+    return render_template("index.html", surveys=SURVEYS.sorted_by_title())
 
 
 @app.get("/s/<survey_key>")
@@ -251,31 +427,75 @@ def survey_page(survey_key: str):
 @app.get("/api/s/<survey_key>/q/<qid>")
 def api_get_question(survey_key: str, qid: str):
     s = get_survey_or_404(survey_key)
-    q = s.questions.get(qid)
-    if not q:
+    payload = s.question_payloads.get(qid)
+    if payload is None:
         return jsonify({"ok": False, "error": "question_not_found"}), 404
 
-    return jsonify({
-        "ok": True,
-        "survey_key": s.key,
-        "qid": q.qid,
-        "type": q.qtype,
-        "title": q.title,
-        "text": q.text,
-        "long_text": q.long_text,
-        "hints": q.hints,
-        "options": [{"idx": opt.idx, "text": opt.text} for opt in q.options],
-    })
+    return app.response_class(payload, mimetype="application/json")
 
 
 def _answers_to_text(answers: List[dict]) -> str:
     # pretty result
-    lines = []
-    for a in answers:
-        qtitle = a.get("question_title") or a.get("qid") or "Вопрос"
-        aval = a.get("value_text") or ""
-        lines.append(f"{qtitle}: {aval}")
-    return "\n".join(lines)
+    return "\n".join(
+        f"{a.get('question_title') or a.get('qid') or 'Вопрос'}: {a.get('value_text') or ''}"
+        for a in answers
+    )
+
+
+# answer handlers return (value_text, next_qid, error); error is None on success
+_AnswerResult = Tuple[str, Optional[str], Optional[str]]
+
+
+def _answer_single(q: Question, data: dict) -> _AnswerResult:
+    option_idx = data.get("option_idx")
+    if not isinstance(option_idx, int):
+        return "", None, "bad_request"
+
+    opt = q.options_by_idx.get(option_idx)
+    if not opt:
+        return "", None, "invalid_option"
+
+    return opt.text, opt.next_qid, None  # next may be None -> finish
+
+
+def _answer_multi(q: Question, data: dict) -> _AnswerResult:
+    option_idxs = data.get("option_idxs")
+    if not isinstance(option_idxs, list) or not all(isinstance(x, int) for x in option_idxs):
+        return "", None, "bad_request"
+    option_idxs = sorted(set(option_idxs))
+    chosen = [q.options_by_idx[i].text for i in option_idxs if i in q.options_by_idx]
+    if not chosen:
+        return "", None, "no_selection"
+
+    return ", ".join(chosen), q.next_id, None  # one next for multi
+
+
+def _answer_text(q: Question, data: dict) -> _AnswerResult:
+    v = _safe_str(data.get("value"))
+    if not v:
+        return "", None, "empty_value"
+    return v, q.next_id, None
+
+
+def _answer_number(q: Question, data: dict) -> _AnswerResult:
+    v = data.get("value")
+    # allow int/float as number
+    if not isinstance(v, (int, float)):
+        # if sent as string - try parse
+        vs = _safe_str(v)
+        try:
+            v = float(vs)
+        except Exception:
+            return "", None, "bad_number"
+    return str(v), q.next_id, None
+
+
+_ANSWER_HANDLERS: Dict[QType, Callable[[Question, dict], _AnswerResult]] = {
+    QType.SINGLE: _answer_single,
+    QType.MULTI: _answer_multi,
+    QType.TEXT: _answer_text,
+    QType.NUMBER: _answer_number,
+}
 
 
 @app.post("/api/s/<survey_key>/answer")
@@ -284,7 +504,9 @@ def api_answer(survey_key: str):
     data = request.get_json(silent=True) or {}
 
     qid = _safe_str(data.get("qid"))
-    answers = data.get("answers") or []
+    answers = data.get("answers")
+    if not isinstance(answers, list):
+        answers = []
 
     if not qid:
         return jsonify({"ok": False, "error": "bad_request"}), 400
@@ -293,65 +515,20 @@ def api_answer(survey_key: str):
     if not q:
         return jsonify({"ok": False, "error": "question_not_found"}), 404
 
-    qtype = q.qtype
-
-    next_qid: Optional[str] = None
-    value_text = ""
-
-    if qtype == "single":
-        option_idx = data.get("option_idx")
-        if not isinstance(option_idx, int):
-            return jsonify({"ok": False, "error": "bad_request"}), 400
-
-        opt = next((o for o in q.options if o.idx == option_idx), None)
-        if not opt:
-            return jsonify({"ok": False, "error": "invalid_option"}), 400
-
-        value_text = opt.text
-        next_qid = opt.next_qid  # may be None -> finish
-
-    elif qtype == "multi":
-        option_idxs = data.get("option_idxs")
-        if not isinstance(option_idxs, list) or not all(isinstance(x, int) for x in option_idxs):
-            return jsonify({"ok": False, "error": "bad_request"}), 400
-        option_idxs = sorted(set(option_idxs))
-        chosen = [o.text for o in q.options if o.idx in option_idxs]
-        if not chosen:
-            return jsonify({"ok": False, "error": "no_selection"}), 400
-
-        value_text = ", ".join(chosen)
-        next_qid = q.next_id  # one next for multi
-
-    elif qtype == "text":
-        v = _safe_str(data.get("value"))
-        if not v:
-            return jsonify({"ok": False, "error": "empty_value"}), 400
-        value_text = v
-        next_qid = q.next_id
-
-    elif qtype == "number":
-        v = data.get("value")
-        # allow int/float as number
-        if not isinstance(v, (int, float)):
-            # if sent as string - try parse
-            vs = _safe_str(v)
-            try:
-                v = float(vs)
-            except Exception:
-                return jsonify({"ok": False, "error": "bad_number"}), 400
-        value_text = str(v)
-        next_qid = q.next_id
-
-    else:
+    handler = _ANSWER_HANDLERS.get(q.qtype)
+    if handler is None:
         return jsonify({"ok": False, "error": "unsupported_type"}), 500
 
-    # append answer
-    answers = list(answers)
+    value_text, next_qid, error = handler(q, data)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    # append answer; answers is a fresh list from get_json, safe to mutate
     answers.append({
         "qid": qid,
         "question_title": q.title,
         "question_text": q.text,
-        "type": qtype,
+        "type": q.qtype,
         "value_text": value_text,
     })
 
@@ -385,4 +562,8 @@ def result_page():
 
 if __name__ == "__main__":
     # debug=True удобно в разработке (автоперезапуск)
+    # the reloader runs this module twice; only the serving child
+    # (WERKZEUG_RUN_MAIN=true) warms the registry, the watcher never parses
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        SURVEYS.preload()
     app.run(host="0.0.0.0", port=8000, debug=True)